@@ -1,8 +1,14 @@
 from __future__ import annotations
+import argparse
+from collections import Counter
 from dataclasses import dataclass, field
-from enum import Enum, auto
+from enum import IntEnum
+from functools import partial
+from multiprocessing import Pool
+import os
 import random
-from typing import List, Optional, Tuple
+import sys
+from typing import Callable, Iterable, List, Optional, Tuple
 
 
 # =========
@@ -10,34 +16,39 @@ from typing import List, Optional, Tuple
 # =========
 
 
-class Role(Enum):
-    ATTACKER = auto()
-    HEALER = auto()
-    SUPPORTER = auto()
-    TANK = auto()
+# 比較が整数比較で済むよう IntEnum（値は 0 始まりの連番）
+class Role(IntEnum):
+    ATTACKER = 0
+    HEALER = 1
+    SUPPORTER = 2
+    TANK = 3
 
 
-class Action(Enum):
-    ATTACK = auto()
-    HEAL = auto()
-    DEFEND = auto()
-    SUPPORT_ATTACK = auto()
-    AOE_ATTACK = auto()  # ★追加：全体攻撃（アタッカー専用）
+class Action(IntEnum):
+    ATTACK = 0
+    HEAL = 1
+    DEFEND = 2
+    SUPPORT_ATTACK = 3
+    AOE_ATTACK = 4  # ★追加：全体攻撃（アタッカー専用）
 
 
-@dataclass
+# 表示用のロール名（role をそのまま添字に使う）
+_ROLE_NAMES = tuple(r.name for r in Role)
+
+
+@dataclass(slots=True)
 class Effects:
     defending: bool = False
     atk_buff: int = 0
     atk_debuff: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Cooldowns:
     aoe_attack: int = 0  # ★追加：全体攻撃のCT（残りターン）
 
 
-@dataclass
+@dataclass(slots=True)
 class Stats:
     max_hp: int = 100
     hp: int = 100
@@ -47,22 +58,54 @@ class Stats:
     spd: int = 5
 
 
-@dataclass
+@dataclass(slots=True)
 class Character:
     name: str
     role: Role
     stats: Stats
     effects: Effects = field(default_factory=Effects)
     cds: Cooldowns = field(default_factory=Cooldowns)
+    # 所属パーティ（Party 生成時にセット）。battle 中の味方/敵判定に使う
+    party: Optional[Party] = field(default=None, repr=False, compare=False)
+    # 生成時のステータス (max_hp, hp, atk, vit, luk, spd)。reset で戻す
+    _template: Tuple[int, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        s = self.stats
+        self._template = (s.max_hp, s.hp, s.atk, s.vit, s.luk, s.spd)
 
     def alive(self) -> bool:
         return self.stats.hp > 0
 
+    def reset(self) -> None:
+        """
+        ★追加：生成直後の状態に戻す（連続シミュレーションでの使い回し用）
+        """
+        s = self.stats
+        s.max_hp, s.hp, s.atk, s.vit, s.luk, s.spd = self._template
+        e = self.effects
+        e.defending = False
+        e.atk_buff = 0
+        e.atk_debuff = 0
+        self.cds.aoe_attack = 0
+
 
-@dataclass
+@dataclass(slots=True)
 class Party:
     name: str
     members: List[Character]
+    # 生存者リスト。apply_damage で HP が 0 になったときだけ更新する
+    alive_members: List[Character] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        for c in self.members:
+            c.party = self
+        self.alive_members = [c for c in self.members if c.alive()]
+
+    def reset(self) -> None:
+        for c in self.members:
+            c.reset()
+        self.alive_members = [c for c in self.members if c.alive()]
 
 
 # =========
@@ -70,24 +113,52 @@ class Party:
 # =========
 
 
-def roll_die() -> int:
-    return random.randint(1, 6)
+DIE_FACES = (1, 2, 3, 4, 5, 6)
 
 
-def roll_dice(n: int) -> int:
-    return sum(roll_die() for _ in range(n))
+@dataclass(slots=True)
+class TurnContext:
+    """
+    ★追加：ターン単位で使い回す作業領域
+      - dice: ターン開始時にまとめて振っておいたダイス目
+      - i: 次に使うダイスの位置
+      - flagged: 防御/バフが付いていて、次のターン開始時に解除が必要なキャラ
+      - cooling: クールタイムが残っているキャラ
+    """
+
+    dice: List[int] = field(default_factory=list)
+    i: int = 0
+    flagged: List[Character] = field(default_factory=list)
+    cooling: List[Character] = field(default_factory=list)
 
 
-def clamp_hp(c: Character) -> None:
-    c.stats.hp = max(0, min(c.stats.hp, c.stats.max_hp))
+_ctx = TurnContext()
+
+
+def refill_dice(k: int) -> None:
+    _ctx.dice = random.choices(DIE_FACES, k=k)
+    _ctx.i = 0
+
+
+def roll_dice(n: int) -> int:
+    ctx = _ctx
+    end = ctx.i + n
+    if end > len(ctx.dice):
+        # 事前に振った分を使い切ったら補充（battle外から呼ばれた場合も含む）
+        refill_dice(max(n, 16))
+        end = n
+    v = sum(ctx.dice[ctx.i:end])
+    ctx.i = end
+    return v
 
 
 def living(p: Party) -> List[Character]:
-    return [c for c in p.members if c.alive()]
+    # キャッシュをそのまま返すので、呼び出し側で書き換えないこと
+    return p.alive_members
 
 
 def party_defeated(p: Party) -> bool:
-    return all(not c.alive() for c in p.members)
+    return not p.alive_members
 
 
 def find_most_damaged_ally(p: Party) -> Optional[Character]:
@@ -104,27 +175,44 @@ def pick_enemy(p: Party) -> Optional[Character]:
     return min(alive, key=lambda c: c.stats.hp)
 
 
-def reset_turn_flags(p1: Party, p2: Party) -> None:
-    for c in p1.members + p2.members:
+def track_effects(chars: List[Character]) -> None:
+    """
+    ★追加：battle 開始時に、解除/CT管理が必要なキャラを登録し直す
+      - 以降は resolve_* で防御・CT をセットしたときに追加する
+    """
+    _ctx.flagged = [c for c in chars if c.effects.defending or c.effects.atk_buff]
+    _ctx.cooling = [c for c in chars if c.cds.aoe_attack > 0]
+
+
+def reset_turn_flags() -> None:
+    # 前のターンに防御/バフが付いたキャラだけ解除する
+    for c in _ctx.flagged:
         c.effects.defending = False
         c.effects.atk_buff = 0
         # c.effects.atk_debuff = 0  # ★消す：次ターンまで残す
+    _ctx.flagged.clear()
 
 
-def tick_cooldowns(p1: Party, p2: Party) -> None:
+def tick_cooldowns() -> None:
     """
     ★追加：ターン開始時にクールタイムを減らす（0未満にしない）
+      - CT が残っているキャラだけ見る
     """
-    for c in p1.members + p2.members:
+    still = []
+    for c in _ctx.cooling:
+        c.cds.aoe_attack -= 1
         if c.cds.aoe_attack > 0:
-            c.cds.aoe_attack -= 1
+            still.append(c)
+    _ctx.cooling = still
 
 
-def build_turn_order(p1: Party, p2: Party) -> List[Character]:
-    chars = living(p1) + living(p2)
-    random.shuffle(chars)
-    chars.sort(key=lambda c: c.stats.spd, reverse=True)
-    return chars
+def build_turn_order(order: List[Character]) -> None:
+    """
+    ★変更：battle 開始時に作った全員のリストを、毎ターンその場で並べ直す
+      - SPD 降順、同 SPD は乱数をタイブレーカーにしてランダム順（sort 1回で済む）
+      - 戦闘不能者も含む（行動時にスキップする）
+    """
+    order.sort(key=lambda c, _r=random.random: (-c.stats.spd, _r()))
 
 
 # =========
@@ -132,12 +220,16 @@ def build_turn_order(p1: Party, p2: Party) -> List[Character]:
 # =========
 
 
-def phase_multiplier(turn: int) -> float:
+def phase_mult10(turn: int) -> int:
+    """
+    ダメージ倍率を10倍した整数で返す（14 = ×1.4）
+      - battle 側でターンごとに1回だけ計算して resolve_* に渡す
+    """
     if turn >= 15:
-        return 1.4
+        return 14
     if turn >= 10:
-        return 1.2
-    return 1.0
+        return 12
+    return 10
 
 
 # =========
@@ -176,8 +268,9 @@ def choose_action(
     # ===== SUPPORTER =====
     if actor.role == Role.SUPPORTER:
         # アタッカー優先で狙う（いなければHP低い敵）
-        attackers = [e for e in enemy_list if e.role == Role.ATTACKER]
-        target = attackers[0] if attackers else pick_enemy(enemies)
+        target = next((e for e in enemy_list if e.role == Role.ATTACKER), None)
+        if target is None:
+            target = pick_enemy(enemies)
 
         # 念のためターゲットが取れない場合は防御に逃がす
         if target is None:
@@ -209,28 +302,42 @@ def effective_atk_value(attacker: Character) -> int:
 
 
 def apply_damage(target: Character, raw: int) -> int:
-    dmg = raw
-    if target.effects.defending:
-        dmg = int(raw * 0.6)
-    target.stats.hp -= dmg
-    clamp_hp(target)
+    # 防御中は ×0.6（整数演算で 6/10）
+    dmg = raw * (6 if target.effects.defending else 10) // 10
+    # ダメージは HP を減らす方向だけなので、下限(0)だけ見ればよい
+    hp = target.stats.hp - dmg
+    if hp > 0:
+        target.stats.hp = hp
+        return dmg
+
+    target.stats.hp = 0
+    if target.party is not None:
+        # 走査中の生存者リストを壊さないよう、作り直して差し替える
+        p = target.party
+        p.alive_members = [c for c in p.alive_members if c is not target]
     return dmg
 
 
-def resolve_attack(attacker: Character, target: Character, turn: int) -> str:
+def resolve_attack(
+    attacker: Character, target: Character, mult10: int, verbose: bool = True
+) -> str:
     if not (attacker.alive() and target.alive()):
         return ""
 
     dice = roll_dice(2)  # 単体攻撃は2個
     atk_val = effective_atk_value(attacker)
-    raw = int(dice * atk_val * phase_multiplier(turn))
+    raw = dice * atk_val * mult10 // 10
 
     dmg = apply_damage(target, raw)
+    if not verbose:
+        return ""
     def_tag = " (DEF)" if target.effects.defending else ""
-    return f"{attacker.name} attacks {target.name}{def_tag}: dice={dice}, mult={phase_multiplier(turn)} raw={raw} -> dmg={dmg} | {target.name} HP={target.stats.hp}"
+    return f"{attacker.name} attacks {target.name}{def_tag}: dice={dice}, mult={mult10 / 10} raw={raw} -> dmg={dmg} | {target.name} HP={target.stats.hp}"
 
 
-def resolve_aoe_attack(attacker: Character, enemies: Party, turn: int) -> str:
+def resolve_aoe_attack(
+    attacker: Character, enemies: Party, mult10: int, verbose: bool = True
+) -> str:
     """
     ★追加：全体攻撃（アタッカー専用）
       - ダイス1個 × ATK（単体より弱い）
@@ -245,76 +352,128 @@ def resolve_aoe_attack(attacker: Character, enemies: Party, turn: int) -> str:
 
     dice = roll_dice(1)  # 全体は1個
     atk_val = effective_atk_value(attacker)
-    raw_base = int(dice * atk_val * phase_multiplier(turn) * 0.8)
+    raw_base = dice * atk_val * mult10 * 8 // 100  # 倍率 × 0.8
+
+    # 受けるダメージは「防御中か否か」の2通りしかないので先に計算しておき、
+    # apply_damage を人数分呼ばずに1ループで HP を減らす
+    dmg_open = raw_base
+    dmg_def = raw_base * 6 // 10
+    fallen = False
 
     logs = []
     for t in targets:
-        dmg = apply_damage(t, raw_base)
-        def_tag = " (DEF)" if t.effects.defending else ""
-        logs.append(f"{t.name}{def_tag} -{dmg} (HP {t.stats.hp})")
+        dmg = dmg_def if t.effects.defending else dmg_open
+        hp = t.stats.hp - dmg
+        if hp <= 0:
+            hp = 0
+            fallen = True
+        t.stats.hp = hp
+        if verbose:
+            def_tag = " (DEF)" if t.effects.defending else ""
+            logs.append(f"{t.name}{def_tag} -{dmg} (HP {hp})")
+
+    if fallen:
+        # 生存者リストは最後に1回だけ作り直す
+        enemies.alive_members = [t for t in targets if t.stats.hp > 0]
 
     attacker.cds.aoe_attack = 3  # CTセット
+    _ctx.cooling.append(attacker)
 
+    if not verbose:
+        return ""
     return (
-        f"{attacker.name} uses WHIRLWIND (AOE)! dice={dice}, mult={phase_multiplier(turn)} raw={raw_base} "
+        f"{attacker.name} uses WHIRLWIND (AOE)! dice={dice}, mult={mult10 / 10} raw={raw_base} "
         f"| " + ", ".join(logs) + f" | CT=3"
     )
 
 
-def resolve_support_attack(supporter: Character, target: Character, turn: int) -> str:
+def resolve_support_attack(
+    supporter: Character, target: Character, mult10: int, verbose: bool = True
+) -> str:
     if not (supporter.alive() and target.alive()):
         return ""
 
     dice = roll_dice(1)
     atk_val = effective_atk_value(supporter)
-    raw = int(dice * atk_val * phase_multiplier(turn))
+    raw = dice * atk_val * mult10 // 10
 
     dmg = apply_damage(target, raw)
 
     # 命中時デバフ：ATK -2（MVPはターン開始リセットで消える）
     target.effects.atk_debuff = -2
 
+    if not verbose:
+        return ""
     def_tag = " (DEF)" if target.effects.defending else ""
     return (
-        f"{supporter.name} support-attacks {target.name}{def_tag}: dice={dice}, mult={phase_multiplier(turn)} raw={raw} -> dmg={dmg} | "
+        f"{supporter.name} support-attacks {target.name}{def_tag}: dice={dice}, mult={mult10 / 10} raw={raw} -> dmg={dmg} | "
         f"{target.name} HP={target.stats.hp} | {target.name} ATK debuff -2"
     )
 
 
-def resolve_heal(healer: Character, target: Character) -> str:
+def resolve_heal(healer: Character, target: Character, verbose: bool = True) -> str:
     if not (healer.alive() and target.alive()):
         return ""
 
     dice = roll_dice(1)
     amount = dice * healer.stats.vit
 
+    # 回復は HP を増やす方向だけなので、上限(max_hp)だけ見ればよい
     before = target.stats.hp
-    target.stats.hp += amount
-    clamp_hp(target)
+    target.stats.hp = min(before + amount, target.stats.max_hp)
     actual = target.stats.hp - before
 
+    if not verbose:
+        return ""
     return f"{healer.name} heals {target.name}: dice={dice}, heal={amount} -> +{actual} | {target.name} HP={target.stats.hp}"
 
 
-def resolve_defend(actor: Character) -> str:
+def resolve_defend(actor: Character, verbose: bool = True) -> str:
     if not actor.alive():
         return ""
     actor.effects.defending = True
+    _ctx.flagged.append(actor)
+    if not verbose:
+        return ""
     return f"{actor.name} defends (incoming dmg x0.6)"
 
 
+# Action（IntEnum の値）→ resolve_* の対応表。引数は (actor, target, enemies, mult10, verbose)
+# 対象が必要な行動は、対象が取れなかったら何もしない
+_RESOLVERS: Tuple[Callable[[Character, Optional[Character], Party, int, bool], str], ...] = (
+    # Action.ATTACK
+    lambda a, t, e, m, v: resolve_attack(a, t, m, v) if t else "",
+    # Action.HEAL
+    lambda a, t, e, m, v: resolve_heal(a, t, v) if t else "",
+    # Action.DEFEND
+    lambda a, t, e, m, v: resolve_defend(a, v),
+    # Action.SUPPORT_ATTACK
+    lambda a, t, e, m, v: resolve_support_attack(a, t, m, v) if t else "",
+    # Action.AOE_ATTACK
+    lambda a, t, e, m, v: resolve_aoe_attack(a, e, m, v),
+)
+
+
 # =========
 #  Battle loop
 # =========
 
 
 def print_party(p: Party) -> None:
-    print(f"[{p.name}]")
+    lines = [f"[{p.name}]"]
     for c in p.members:
         s = c.stats
-        print(
-            f"  - {c.name:10s} {c.role.name:9s} HP={s.hp}/{s.max_hp} ATK={s.atk} VIT={s.vit} SPD={s.spd}"
+        lines.append(
+            f"  - {c.name:10s} {_ROLE_NAMES[c.role]:9s} HP={s.hp}/{s.max_hp} ATK={s.atk} VIT={s.vit} SPD={s.spd}"
         )
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def flush_logs(logs: List[str]) -> None:
+    # 1ターン分のログをまとめて書き出す（print の連発を避ける）
+    if logs:
+        sys.stdout.write("\n".join(logs) + "\n")
+        logs.clear()
 
 
 def print_status(p1: Party, p2: Party) -> None:
@@ -322,64 +481,75 @@ def print_status(p1: Party, p2: Party) -> None:
         parts = [f"{c.name}:{c.stats.hp}" for c in p.members]
         return f"{p.name} | " + " ".join(parts)
 
-    print(line(p1))
-    print(line(p2))
+    sys.stdout.write(line(p1) + "\n" + line(p2) + "\n")
 
 
-def battle(p1: Party, p2: Party, seed: Optional[int] = 0, turn_limit: int = 50) -> str:
+def battle(
+    p1: Party,
+    p2: Party,
+    seed: Optional[int] = 0,
+    turn_limit: int = 50,
+    verbose: bool = True,
+) -> str:
     if seed is not None:
         random.seed(seed)
 
     turn = 1
-    print(f"=== Battle Start: {p1.name} vs {p2.name} ===")
-    print_party(p1)
-    print_party(p2)
-    print()
-
+    if verbose:
+        print(f"=== Battle Start: {p1.name} vs {p2.name} ===")
+        print_party(p1)
+        print_party(p2)
+        print()
+
+    order = p1.members + p2.members
+    track_effects(order)
+    logs: List[str] = []
     while turn <= turn_limit:
-        print(f"\n--- Turn {turn} ---")
-        tick_cooldowns(p1, p2)
-        reset_turn_flags(p1, p2)
-        order = build_turn_order(p1, p2)
+        if verbose:
+            logs.append(f"\n--- Turn {turn} ---")
+        tick_cooldowns()
+        reset_turn_flags()
+        build_turn_order(order)
+        # 1人あたり最大2個振るので、このターン分をまとめて用意しておく
+        refill_dice(len(order) * 2)
+        mult10 = phase_mult10(turn)
 
         for actor in order:
             if not actor.alive():
                 continue
 
-            allies = p1 if actor in p1.members else p2
-            enemies = p2 if actor in p1.members else p1
+            allies = actor.party
+            enemies = p2 if allies is p1 else p1
 
             action, target = choose_action(actor, allies, enemies)
 
-            log = ""
-            if action == Action.ATTACK and target:
-                log = resolve_attack(actor, target, turn)
-            elif action == Action.AOE_ATTACK:
-                log = resolve_aoe_attack(actor, enemies, turn)
-            elif action == Action.SUPPORT_ATTACK and target:
-                log = resolve_support_attack(actor, target, turn)
-            elif action == Action.HEAL and target:
-                log = resolve_heal(actor, target)
-            elif action == Action.DEFEND:
-                log = resolve_defend(actor)
+            log = _RESOLVERS[action](actor, target, enemies, mult10, verbose)
 
+            # verbose=False のときは resolve_* が空文字を返す
             if log:
                 # CT表示を少し見やすく（アタッカーのみ）
                 if actor.role == Role.ATTACKER:
                     log += f" | {actor.name} AOE_CT={actor.cds.aoe_attack}"
-                print(log)
+                logs.append(log)
 
             if party_defeated(p1):
-                print(f"\n=== Winner: {p2.name} ===")
+                if verbose:
+                    logs.append(f"\n=== Winner: {p2.name} ===")
+                    flush_logs(logs)
                 return p2.name
             if party_defeated(p2):
-                print(f"\n=== Winner: {p1.name} ===")
+                if verbose:
+                    logs.append(f"\n=== Winner: {p1.name} ===")
+                    flush_logs(logs)
                 return p1.name
 
-        print_status(p1, p2)
+        if verbose:
+            flush_logs(logs)
+            print_status(p1, p2)
         turn += 1
 
-    print("\n=== Draw (turn limit reached) ===")
+    if verbose:
+        print("\n=== Draw (turn limit reached) ===")
     return "DRAW"
 
 
@@ -398,7 +568,91 @@ def make_sample_party(name: str) -> Party:
     return Party(name=name, members=members)
 
 
+# =========
+#  Simulation (Monte Carlo)
+# =========
+
+
+def run_batch(
+    p1_factory: Callable[[], Party],
+    p2_factory: Callable[[], Party],
+    seeds: Iterable[int],
+    turn_limit: int = 50,
+) -> List[str]:
+    """
+    ★追加：バランス調整用に seed ごとの試合をまとめて回す（ログ出力なし）
+      - パーティは factory で1回だけ作り、試合ごとに reset して使い回す
+      - 戻り値は seed 順の勝者名（引き分けは "DRAW"）
+    """
+    p1 = p1_factory()
+    p2 = p2_factory()
+    winners = []
+    for seed in seeds:
+        p1.reset()
+        p2.reset()
+        winners.append(battle(p1, p2, seed=seed, turn_limit=turn_limit, verbose=False))
+    return winners
+
+
+def _worker(
+    p1_factory: Callable[[], Party],
+    p2_factory: Callable[[], Party],
+    turn_limit: int,
+    seeds: List[int],
+) -> List[str]:
+    # Pool から呼ぶのでトップレベルに置く（pickle できるように）
+    return run_batch(p1_factory, p2_factory, seeds, turn_limit)
+
+
+def run_ensemble(
+    p1_factory: Callable[[], Party],
+    p2_factory: Callable[[], Party],
+    seeds: Iterable[int],
+    workers: Optional[int] = None,
+    turn_limit: int = 50,
+) -> List[str]:
+    """
+    ★追加：run_batch の並列版（試合同士は独立なのでプロセスに分けるだけ）
+      - factory は pickle できるもの（トップレベル関数や partial）を渡す
+      - workers=None なら CPU コア数
+    """
+    # seed を連続したまとまりに分け、まとまりごとにパーティを使い回す
+    seeds = list(seeds)
+    n_chunks = (workers or os.cpu_count() or 1) * 4
+    size = max(1, -(-len(seeds) // n_chunks))
+    chunks = [seeds[i : i + size] for i in range(0, len(seeds), size)]
+
+    job = partial(_worker, p1_factory, p2_factory, turn_limit)
+    with Pool(workers) as pool:
+        return [w for part in pool.map(job, chunks) for w in part]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="CLI card battle (MVP)")
+    parser.add_argument("--seed", type=int, default=1, help="乱数seed（--sims時は開始seed）")
+    parser.add_argument("--turns", type=int, default=50, help="ターン上限")
+    parser.add_argument(
+        "--sims", type=int, default=0, help="指定回数の試合をログなしで回し、勝敗を集計する"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="--sims 時の並列プロセス数（0ならCPUコア数）"
+    )
+    args = parser.parse_args(argv)
+
+    if args.sims <= 0:
+        battle(make_sample_party("A"), make_sample_party("B"), seed=args.seed, turn_limit=args.turns)
+        return
+
+    seeds = range(args.seed, args.seed + args.sims)
+    p1_factory = partial(make_sample_party, "A")
+    p2_factory = partial(make_sample_party, "B")
+    if args.workers == 1:
+        winners = run_batch(p1_factory, p2_factory, seeds, args.turns)
+    else:
+        winners = run_ensemble(p1_factory, p2_factory, seeds, args.workers or None, args.turns)
+    for name, count in Counter(winners).most_common():
+        print(f"{name}: {count} ({count / args.sims:.1%})")
+
+
 if __name__ == "__main__":
-    p1 = make_sample_party("A")
-    p2 = make_sample_party("B")
-    battle(p1, p2, seed=1, turn_limit=50)
+    main()